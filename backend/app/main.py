@@ -1,4 +1,5 @@
 import os
+import time
 from typing import Optional
 from pathlib import Path
 
@@ -22,6 +23,7 @@ from .services.geocode import (
 )
 from .services.weather_client import fetch_hourly_forecast
 from .utils.risk_engine import compute_risk
+from .utils.admission import AdmissionController, Overloaded
 
 # ---------------------------------------------------------------------
 # Config
@@ -36,6 +38,33 @@ app = FastAPI(title="AlagAlert API", version="0.7.0")
 app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 
+# ---------------------------------------------------------------------
+# Controle de admissão (antes do CORS para que o 503 também leve CORS)
+# ---------------------------------------------------------------------
+admission = AdmissionController()
+app.state.admission = admission
+
+@app.middleware("http")
+async def admission_control(request: Request, call_next):
+    klass = admission.classify(request.method, request.url.path)
+    if klass is None:
+        return await call_next(request)
+    try:
+        started = await admission.acquire(klass)
+    except Overloaded as e:
+        return JSONResponse(
+            {"detail": "Servidor sobrecarregado, tente novamente em instantes", "class": e.klass},
+            status_code=503,
+            headers={"Retry-After": str(e.retry_after)},
+        )
+    service_time = None
+    try:
+        response = await call_next(request)
+        service_time = time.monotonic() - started
+        return response
+    finally:
+        admission.release(klass, service_time)
+
 # CORS
 app.add_middleware(
     CORSMiddleware,
@@ -58,7 +87,7 @@ class RiskBody(BaseModel):
 @app.get("/health")
 @limiter.limit(RATE_LIMIT)
 def health(request: Request):
-    return JSONResponse({"ok": True})
+    return JSONResponse({"ok": True, "admission": admission.snapshot()})
 
 # ---------------------------------------------------------------------
 # Geocode (cidades)
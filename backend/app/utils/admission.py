@@ -0,0 +1,201 @@
+# app/utils/admission.py
+"""
+Controle de admissão por classe de endpoint.
+
+Cada classe (light / interactive / heavy) tem seu próprio orçamento de
+concorrência e sua própria fila, então um /risk/by-uf lento não ocupa as vagas
+de /health, /regions ou /risk/by-city.
+
+Classes "sheddable" (heavy) usam um alvo de atraso de fila no estilo CoDel:
+se o menor tempo de espera na fila fica acima de `target_ms` por mais de
+`interval_ms`, a classe entra em modo de descarte e novas requisições que
+precisariam esperar são recusadas na hora (503 + Retry-After) em vez de
+acumularem. Heavy também é recusada enquanto a classe interactive estiver
+sob pressão, para que consultas de risco por cidade continuem respondendo.
+"""
+import asyncio
+import math
+import os
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Dict, Optional, Tuple
+
+
+class Overloaded(Exception):
+    def __init__(self, klass: str, retry_after: int):
+        super().__init__(f"classe '{klass}' sobrecarregada")
+        self.klass = klass
+        self.retry_after = retry_after
+
+
+@dataclass
+class ClassBudget:
+    max_concurrency: int
+    max_queue: int
+    max_wait_ms: float
+    target_ms: float = 0.0
+    interval_ms: float = 0.0
+    sheddable: bool = False
+
+
+def _env_budget(name: str, **defaults) -> ClassBudget:
+    prefix = f"ADMISSION_{name.upper()}_"
+    b = ClassBudget(**defaults)
+    b.max_concurrency = int(os.getenv(prefix + "CONCURRENCY", b.max_concurrency))
+    b.max_queue = int(os.getenv(prefix + "QUEUE", b.max_queue))
+    b.max_wait_ms = float(os.getenv(prefix + "MAX_WAIT_MS", b.max_wait_ms))
+    b.target_ms = float(os.getenv(prefix + "TARGET_MS", b.target_ms))
+    b.interval_ms = float(os.getenv(prefix + "INTERVAL_MS", b.interval_ms))
+    return b
+
+
+DEFAULT_BUDGETS: Dict[str, ClassBudget] = {
+    "light": _env_budget("light", max_concurrency=64, max_queue=256, max_wait_ms=2000),
+    "interactive": _env_budget("interactive", max_concurrency=16, max_queue=64, max_wait_ms=10000),
+    "heavy": _env_budget(
+        "heavy", max_concurrency=2, max_queue=4, max_wait_ms=5000,
+        target_ms=500, interval_ms=5000, sheddable=True,
+    ),
+}
+
+# (método, caminho) -> classe. Rotas fora do mapa não passam pelo controle.
+ROUTE_CLASSES: Dict[Tuple[str, str], str] = {
+    ("GET", "/health"): "light",
+    ("GET", "/regions"): "light",
+    ("GET", "/states"): "light",
+    ("GET", "/cities"): "light",
+    ("GET", "/geocode"): "light",
+    ("GET", "/geocode-states"): "light",
+    ("GET", "/risk/by-city"): "interactive",
+    ("POST", "/risk"): "interactive",
+    ("GET", "/risk/by-uf"): "heavy",
+}
+
+
+class _ClassState:
+    def __init__(self, budget: ClassBudget):
+        self.budget = budget
+        self.in_flight = 0
+        self.waiters: Deque[Tuple[asyncio.Future, float]] = deque()
+        # CoDel
+        self.first_above: float = 0.0
+        self.dropping = False
+        # média móvel do tempo de serviço (s), usada no Retry-After
+        self.avg_service = 1.0
+
+    def under_pressure(self) -> bool:
+        return self.dropping or bool(self.waiters)
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        budgets: Optional[Dict[str, ClassBudget]] = None,
+        routes: Optional[Dict[Tuple[str, str], str]] = None,
+        priority_over: Optional[Dict[str, str]] = None,
+    ):
+        budgets = budgets if budgets is not None else DEFAULT_BUDGETS
+        self.routes = routes if routes is not None else ROUTE_CLASSES
+        self.classes = {name: _ClassState(b) for name, b in budgets.items()}
+        # classe -> classe que tem prioridade sobre ela
+        self.priority_over = priority_over if priority_over is not None else {"heavy": "interactive"}
+
+    def classify(self, method: str, path: str) -> Optional[str]:
+        return self.routes.get((method.upper(), path.rstrip("/") or "/"))
+
+    def snapshot(self) -> Dict[str, Dict]:
+        return {
+            name: {
+                "in_flight": st.in_flight,
+                "queued": len(st.waiters),
+                "dropping": st.dropping,
+                "avg_service_s": round(st.avg_service, 3),
+            }
+            for name, st in self.classes.items()
+        }
+
+    def _retry_after(self, st: _ClassState) -> int:
+        backlog = len(st.waiters) + st.in_flight + 1
+        est = st.avg_service * backlog / max(1, st.budget.max_concurrency)
+        return max(1, int(math.ceil(est)))
+
+    def _update_codel(self, st: _ClassState, sojourn: float, now: float) -> None:
+        b = st.budget
+        if not b.sheddable:
+            return
+        if sojourn * 1000 < b.target_ms:
+            st.first_above = 0.0
+            st.dropping = False
+        elif st.first_above == 0.0:
+            st.first_above = now + b.interval_ms / 1000
+        elif now >= st.first_above:
+            st.dropping = True
+
+    def _yields_priority(self, klass: str, st: _ClassState) -> bool:
+        if not st.budget.sheddable:
+            return False
+        boss = self.priority_over.get(klass)
+        return bool(boss and boss in self.classes and self.classes[boss].under_pressure())
+
+    @staticmethod
+    def _drop_waiter(st: _ClassState, fut: asyncio.Future) -> None:
+        for item in st.waiters:
+            if item[0] is fut:
+                st.waiters.remove(item)
+                break
+
+    async def acquire(self, klass: str) -> float:
+        """Reserva uma vaga na classe; retorna o instante de início do serviço."""
+        st = self.classes[klass]
+        b = st.budget
+        now = time.monotonic()
+
+        if self._yields_priority(klass, st):
+            raise Overloaded(klass, self._retry_after(st))
+
+        if st.in_flight < b.max_concurrency and not st.waiters:
+            st.in_flight += 1
+            self._update_codel(st, 0.0, now)
+            return now
+
+        # teria que esperar: em modo de descarte ou com fila cheia, recusa já
+        if (b.sheddable and st.dropping) or len(st.waiters) >= b.max_queue:
+            raise Overloaded(klass, self._retry_after(st))
+
+        fut = asyncio.get_running_loop().create_future()
+        st.waiters.append((fut, now))
+        try:
+            await asyncio.wait_for(asyncio.shield(fut), timeout=b.max_wait_ms / 1000)
+        except asyncio.TimeoutError:
+            if fut.done() and not fut.cancelled():
+                # a vaga chegou junto com o timeout: devolve
+                self.release(klass, 0.0)
+            else:
+                fut.cancel()
+                self._drop_waiter(st, fut)
+            self._update_codel(st, time.monotonic() - now, time.monotonic())
+            raise Overloaded(klass, self._retry_after(st))
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                self.release(klass, 0.0)
+            else:
+                fut.cancel()
+                self._drop_waiter(st, fut)
+            raise
+
+        started = time.monotonic()
+        self._update_codel(st, started - now, started)
+        return started
+
+    def release(self, klass: str, service_time: Optional[float] = None) -> None:
+        st = self.classes[klass]
+        if service_time:
+            st.avg_service = 0.8 * st.avg_service + 0.2 * service_time
+        st.in_flight -= 1
+        while st.waiters and st.in_flight < st.budget.max_concurrency:
+            fut, _ = st.waiters.popleft()
+            if fut.done():
+                continue
+            st.in_flight += 1
+            fut.set_result(None)